@@ -1,8 +1,9 @@
 import uuid
 
-from django.core.exceptions import FieldDoesNotExist
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 from django.db import models
+from django.db import transaction
 from django.utils import timezone
 from morango.models import UUIDField
 
@@ -16,7 +17,7 @@ from kolibri.utils.version import truncate_version
 
 
 def _filter_out_unsupported_fields(fields):
-    return {k: v for (k, v) in fields.items() if NetworkLocation.has_field(k)}
+    return {k: v for (k, v) in fields.items() if k in NETWORK_LOCATION_FIELDS}
 
 
 def _uuid_string():
@@ -139,14 +140,6 @@ class NetworkLocation(models.Model):
     def is_kolibri(self):
         return self.application == "kolibri"
 
-    @classmethod
-    def has_field(cls, field):
-        try:
-            cls._meta.get_field(field)
-            return True
-        except FieldDoesNotExist:
-            return False
-
     def matches_version(self, version):
         """
         Truncates the kolibri version to the patch level (0.16.0a1 -> 0.16.0) and compares it with
@@ -158,6 +151,13 @@ class NetworkLocation(models.Model):
         return matches_version(truncate_version(self.kolibri_version), version)
 
 
+# the names of the fields on `NetworkLocation`, for cheaply filtering out device info that
+# doesn't correspond to any field
+NETWORK_LOCATION_FIELDS = frozenset(
+    field.name for field in NetworkLocation._meta.concrete_fields
+)
+
+
 class StaticNetworkLocationManager(models.Manager):
     def get_queryset(self):
         queryset = super(StaticNetworkLocationManager, self).get_queryset()
@@ -183,12 +183,35 @@ class DynamicNetworkLocationManager(models.Manager):
         kwargs = _filter_out_unsupported_fields(kwargs)
         return super(DynamicNetworkLocationManager, self).create(*args, **kwargs)
 
-    def update_or_create(self, defaults, **kwargs):
+    def upsert(self, defaults, pk):
+        """
+        Updates the location with `pk` in place, or inserts it if it doesn't exist yet. Unlike
+        `update_or_create`, this never reads before it writes, so the SQLite write lock is
+        taken by the first statement and concurrent discoveries queue on the busy timeout
+        instead of failing with "database is locked" while upgrading a read lock.
+        :rtype: DynamicNetworkLocation
+        """
         defaults = _filter_out_unsupported_fields(defaults)
-
-        return super(DynamicNetworkLocationManager, self).update_or_create(
-            defaults, **kwargs
-        )
+        network_location = self.model(pk=pk, **defaults)
+        network_location.validate_instance_id()
+
+        with transaction.atomic(using=self.db):
+            if self._update_existing(pk, defaults):
+                return self.get(pk=pk)
+            try:
+                # savepoint, so that losing the insert race doesn't break the outer transaction
+                with transaction.atomic(using=self.db):
+                    network_location.save(force_insert=True, using=self.db)
+                return network_location
+            except IntegrityError:
+                # a concurrent discovery of the same instance inserted it first, so update that
+                # instead, unless the ID belongs to a location that isn't dynamic
+                if not self._update_existing(pk, defaults):
+                    raise
+        return self.get(pk=pk)
+
+    def _update_existing(self, pk, defaults):
+        return self.filter(pk=pk).update(last_accessed=timezone.now(), **defaults)
 
 
 class DynamicNetworkLocation(NetworkLocation):
@@ -201,21 +224,23 @@ class DynamicNetworkLocation(NetworkLocation):
     class Meta:
         proxy = True
 
-    def save(self, *args, **kwargs):
+    def validate_instance_id(self):
         if self.id and self.instance_id and self.id != self.instance_id:
             raise ValidationError(
                 {"instance_id": "`instance_id` and `id` must be the same"}
             )
 
-        if self.instance_id:
-            return super(DynamicNetworkLocation, self).save(*args, **kwargs)
-        else:
+        if not self.instance_id:
             raise ValidationError(
                 {
                     "instance_id": "DynamicNetworkLocations must be be created with an instance ID!"
                 }
             )
 
+    def save(self, *args, **kwargs):
+        self.validate_instance_id()
+        return super(DynamicNetworkLocation, self).save(*args, **kwargs)
+
 
 class NetworkLocationRouter(object):
     """
@@ -2,11 +2,14 @@ import datetime
 import functools
 import hashlib
 import logging
-import time
+import random
 
+from django.core import serializers
 from django.core.exceptions import ValidationError
+from django.db import connections
 from django.db import IntegrityError
-from django.db.utils import OperationalError
+from django.db import router
+from django.db import transaction
 
 from kolibri.core.device.task_notifications import status_fn
 from kolibri.core.device.utils import get_device_setting
@@ -24,16 +27,29 @@ from kolibri.core.discovery.well_known import CENTRAL_CONTENT_BASE_URL
 from kolibri.core.discovery.well_known import DATA_PORTAL_BASE_INSTANCE_ID
 from kolibri.core.discovery.well_known import DATA_PORTAL_SYNCING_BASE_URL
 from kolibri.core.tasks.decorators import register_task
+from kolibri.core.tasks.exceptions import JobNotFound
+from kolibri.core.tasks.exceptions import JobRunning
 from kolibri.core.tasks.job import Priority
+from kolibri.core.tasks.job import State
 from kolibri.core.tasks.main import job_storage
 from kolibri.core.tasks.utils import get_current_job
+from kolibri.utils.time_utils import local_now
+from kolibri.utils.time_utils import naive_utc_datetime
 
 logger = logging.getLogger(__name__)
 
 CONNECTION_RESET_JOB_ID = "1000"
 CONNECTION_FAULT_LIMIT = 10
+# upper bound, in minutes, on the delay between connection attempts
+MAX_BACKOFF_MINUTES = 60
+# spacing between the connection checks enqueued for static locations after a network change
+STATIC_LOCATION_UPDATE_STAGGER = datetime.timedelta(seconds=1)
+# how long to wait before retrying to enqueue hooks while earlier ones are being dispatched
+DISCOVERY_HOOKS_RETRY_DELAY = datetime.timedelta(seconds=5)
 
 TYPE_CONNECT = "connect"
+TYPE_HOOKS = "hooks"
+TYPE_DEFERRED_HOOKS = "deferred_hooks"
 TYPE_ADD = "add"
 TYPE_REMOVE = "remove"
 
@@ -50,13 +66,13 @@ def _store_dynamic_instance(broadcast_id, instance):
         "Creating `DynamicNetworkLocation` for instance {}".format(instance.id)
     )
     try:
-        network_location, _ = DynamicNetworkLocation.objects.update_or_create(
-            dict(
-                base_url=instance.base_url,
-                broadcast_id=broadcast_id,
-                ip_address=instance.ip,
-                **instance.device_info
-            ),
+        network_location = DynamicNetworkLocation.objects.upsert(
+            {
+                **instance.device_info,
+                "base_url": instance.base_url,
+                "broadcast_id": broadcast_id,
+                "ip_address": instance.ip,
+            },
             pk=instance.zeroconf_id,
         )
     except ValidationError:
@@ -77,40 +93,49 @@ def _store_dynamic_instance(broadcast_id, instance):
                 traceback.format_exc(limit=1),
             )
         )
-    except OperationalError as e:
-        if "database is locked" not in str(e):
-            raise
-        logger.debug(
-            "Encountered locked database while creating `DynamicNetworkLocation`"
-        )
     except IntegrityError as e:
         if "UNIQUE constraint failed: discovery_networklocation.id" not in str(e):
             raise
         logger.debug(
-            "Encountered unique constraint error while creating `DynamicNetworkLocation` - instance is probably being announced twice on the network"
+            "Encountered unique constraint error while creating `DynamicNetworkLocation` - instance is probably already saved as a static location"
         )
     return network_location
 
 
+def _get_discovery_hooks(hook_type):
+    """
+    :param hook_type: "on_connect" or "on_disconnect"
+    :return: the registered hooks that override the given hook method, as there's no need to
+        call the base class no-ops
+    """
+    base_method = getattr(NetworkLocationDiscoveryHook, hook_type)
+    return tuple(
+        hook
+        for hook in NetworkLocationDiscoveryHook.registered_hooks
+        if getattr(type(hook), hook_type, None) is not base_method
+    )
+
+
 def _dispatch_discovery_hooks(network_location, is_connected):
     """
     :type network_location: NetworkLocation
     :type is_connected: bool
     """
     hook_type = "on_connect" if is_connected else "on_disconnect"
+    hooks = _get_discovery_hooks(hook_type)
+    if not hooks:
+        return
+
     logger.debug(
         "Dispatching {} hooks for network location {}".format(
             hook_type, network_location.id
         )
     )
-    for hook in NetworkLocationDiscoveryHook.registered_hooks:
+    for hook in hooks:
         # we catch all errors because as a rule of thumb,
         # we don't want hooks to fail everything else
         try:
-            if is_connected:
-                hook.on_connect(network_location)
-            else:
-                hook.on_disconnect(network_location)
+            getattr(hook, hook_type)(network_location)
         except Exception as e:
             logger.error(
                 "{}.{} hook failed".format(
@@ -121,6 +146,65 @@ def _dispatch_discovery_hooks(network_location, is_connected):
             )
 
 
+def _schedule_discovery_hooks(
+    network_location_id, serialized_network_location, is_connected
+):
+    """
+    Enqueues `dispatch_discovery_hooks` under one job ID per location, so hooks for a location are
+    dispatched in order, and a queued job is replaced by the latest transition
+    :return: False if the location's hooks are being dispatched, so the job couldn't be replaced
+    """
+    try:
+        dispatch_discovery_hooks.enqueue_in(
+            datetime.timedelta(0),
+            job_id=generate_job_id(TYPE_HOOKS, network_location_id),
+            args=(serialized_network_location, is_connected),
+        )
+    except JobRunning:
+        return False
+    return True
+
+
+def _enqueue_discovery_hooks(network_location, is_connected):
+    """
+    Enqueues `dispatch_discovery_hooks` so that slow hooks don't hold up connection checks. The
+    location is serialized because disconnected locations may be deleted before the job runs.
+    :type network_location: NetworkLocation
+    :type is_connected: bool
+    """
+    hook_type = "on_connect" if is_connected else "on_disconnect"
+    # avoid creating jobs that would only call the base class no-ops
+    if not _get_discovery_hooks(hook_type):
+        return
+
+    serialized_network_location = serializers.serialize("json", [network_location])
+    deferred_job_id = generate_job_id(TYPE_DEFERRED_HOOKS, network_location.id)
+    if _schedule_discovery_hooks(
+        network_location.id, serialized_network_location, is_connected
+    ):
+        # a transition deferred behind an earlier dispatch is now out of date
+        try:
+            if job_storage.get_orm_job(deferred_job_id).state == State.QUEUED:
+                job_storage.cancel(deferred_job_id)
+        except JobNotFound:
+            pass
+        return
+
+    # the hooks for an earlier transition are being dispatched, so retry once they've finished
+    try:
+        enqueue_deferred_discovery_hooks.enqueue_in(
+            DISCOVERY_HOOKS_RETRY_DELAY,
+            job_id=deferred_job_id,
+            args=(network_location.id, serialized_network_location, is_connected),
+        )
+    except JobRunning:
+        logger.debug(
+            "Hooks for network location {} are already being enqueued".format(
+                network_location.id
+            )
+        )
+
+
 def _update_connection_status(network_location):
     """
     Performs the call to update a specific network location's status, and dispatches hooks
@@ -150,7 +234,7 @@ def _update_connection_status(network_location):
         prior_status,
         new_status,
     ):
-        _dispatch_discovery_hooks(network_location, new_status == ConnectionStatus.Okay)
+        _enqueue_discovery_hooks(network_location, new_status == ConnectionStatus.Okay)
 
     return new_status
 
@@ -161,10 +245,8 @@ def hydrate_instance(func):
     """
 
     @functools.wraps(func)
-    def wrapped(*args):
-        new_args = list(args)
-        new_args[1] = KolibriInstance.from_dict(args[1])
-        return func(*new_args)
+    def wrapped(first_arg, instance, *args):
+        return func(first_arg, KolibriInstance.from_dict(instance), *args)
 
     # for py2.7
     if not hasattr(wrapped, "__wrapped__"):
@@ -177,16 +259,61 @@ def generate_job_id(*args):
     """
     Utility for preventing job duplicates by hashing arguments to create job IDs
     """
-    md5 = hashlib.md5()
-    for arg in args:
-        md5.update(arg.encode("utf-8"))
-    return md5.hexdigest()
+    # NUL-separate the arguments so that e.g. ("ab", "c") and ("a", "bc") don't collide
+    return hashlib.blake2b("\0".join(args).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _enqueue_network_location_update(network_location_id, delay=None, priority=None):
+    """
+    Enqueues a connection check for the network location, unless one is already running or is
+    already queued to run no later than this one would. Connection checks share a job ID per
+    location, so re-enqueueing would otherwise push back a sooner check, or fail for a running one
+    :param network_location_id: The hex ID of the network location to update
+    :type delay: datetime.timedelta
+    :type priority: int
+    """
+    job_id = generate_job_id(TYPE_CONNECT, network_location_id)
+    delay = delay or datetime.timedelta(0)
+
+    try:
+        existing_job = job_storage.get_orm_job(job_id)
+    except JobNotFound:
+        existing_job = None
+
+    if existing_job is not None and (
+        existing_job.state in (State.SELECTED, State.RUNNING)
+        or (
+            existing_job.state == State.QUEUED
+            and existing_job.scheduled_time <= naive_utc_datetime(local_now() + delay)
+        )
+    ):
+        logger.debug(
+            "Skipping connection check for network location {}, one is already {}".format(
+                network_location_id, existing_job.state.lower()
+            )
+        )
+        return
+
+    try:
+        perform_network_location_update.enqueue_in(
+            delay,
+            job_id=job_id,
+            args=(network_location_id,),
+            priority=priority,
+        )
+    except JobRunning:
+        logger.debug(
+            "Connection check for network location {} already running".format(
+                network_location_id
+            )
+        )
 
 
 def _enqueue_network_location_update_with_backoff(network_location):
     """
     Enqueues another delayed job of `perform_network_location_update` with an exponential delay
-    dependent on how many connection faults have occurred
+    dependent on how many connection faults have occurred, capped at `MAX_BACKOFF_MINUTES` and
+    jittered so that many locations failing together don't all retry at the same moment
     :type network_location: NetworkLocation
     """
     # Check if the network location is local before proceeding
@@ -198,9 +325,11 @@ def _enqueue_network_location_update_with_backoff(network_location):
         )
         return
     # exponential backoff depending on how many faults/attempts we've had
-    next_attempt_minutes = 2 ** network_location.connection_faults
+    backoff_minutes = min(2 ** network_location.connection_faults, MAX_BACKOFF_MINUTES)
+    # "equal jitter": wait somewhere between half and all of the backoff
+    next_attempt_minutes = random.uniform(backoff_minutes / 2.0, backoff_minutes)
     logger.debug(
-        "Delaying network location {} connection update {} minutes".format(
+        "Delaying network location {} connection update {:.2f} minutes".format(
             network_location.id, next_attempt_minutes
         )
     )
@@ -253,12 +382,7 @@ def add_dynamic_network_location(broadcast_id, instance):
     :param instance: The new Kolibri instance that has been discovered
     :type instance: kolibri.core.discovery.utils.network.broadcast.KolibriInstance
     """
-    attempts = 0
-    network_location = None
-    while network_location is None and attempts <= 5:
-        network_location = _store_dynamic_instance(broadcast_id, instance)
-        attempts += 1
-        time.sleep(0.1)
+    network_location = _store_dynamic_instance(broadcast_id, instance)
 
     # if we couldn't store it, that's the end
     if network_location is None:
@@ -276,11 +400,7 @@ def add_dynamic_network_location(broadcast_id, instance):
     logger.debug(
         "Enqueuing connection check for network location {}".format(network_location.id)
     )
-    perform_network_location_update.enqueue(
-        job_id=generate_job_id(TYPE_CONNECT, network_location.id),
-        args=(network_location.id,),
-        priority=priority,
-    )
+    _enqueue_network_location_update(network_location.id, priority=priority)
 
 
 @register_task(priority=Priority.HIGH, status_fn=status_fn)
@@ -300,10 +420,44 @@ def remove_dynamic_network_location(broadcast_id, instance):
         return
 
     logger.debug("Removing network location {}".format(network_location.id))
-    _dispatch_discovery_hooks(network_location, False)
+    _enqueue_discovery_hooks(network_location, False)
     network_location.delete()
 
 
+@register_task(priority=Priority.REGULAR)
+def dispatch_discovery_hooks(serialized_network_location, is_connected):
+    """
+    Handles dispatching connect or disconnect hooks for a network location
+    :param serialized_network_location: The network location serialized as Django JSON
+    :type serialized_network_location: str
+    :param is_connected: Whether the location has connected or disconnected
+    :type is_connected: bool
+    """
+    network_location = next(
+        serializers.deserialize("json", serialized_network_location)
+    ).object
+    _dispatch_discovery_hooks(network_location, is_connected)
+
+
+@register_task(priority=Priority.REGULAR)
+def enqueue_deferred_discovery_hooks(
+    network_location_id, serialized_network_location, is_connected
+):
+    """
+    Enqueues hooks for a transition that happened while hooks for an earlier one were dispatched
+    :param network_location_id: The ID of the network location
+    :type network_location_id: str
+    :param serialized_network_location: The network location serialized as Django JSON
+    :type serialized_network_location: str
+    :param is_connected: Whether the location has connected or disconnected
+    :type is_connected: bool
+    """
+    if not _schedule_discovery_hooks(
+        network_location_id, serialized_network_location, is_connected
+    ):
+        get_current_job().retry_in(DISCOVERY_HOOKS_RETRY_DELAY)
+
+
 @register_task(priority=Priority.HIGH, status_fn=status_fn)
 @hydrate_instance
 def dispatch_broadcast_hooks(hook_type, instance):
@@ -378,6 +532,31 @@ def _refresh_reserved_locations():
     )
 
 
+def _cancel_orphaned_network_location_updates():
+    """
+    Cancels queued connection checks whose job ID doesn't match `generate_job_id`, like those
+    enqueued before job IDs were BLAKE2b hashes, as they can't be found to be skipped or canceled
+    """
+    for job in job_storage.filter_jobs(
+        func=perform_network_location_update.func_string, state=State.QUEUED
+    ):
+        if job.job_id != generate_job_id(TYPE_CONNECT, *job.args):
+            job_storage.cancel(job.job_id)
+
+
+def _enqueue_static_location_updates(static_location_ids):
+    """
+    Enqueues a connection check for each static location, staggering them so that the workers
+    aren't all contacting locations at the same moment after a network change. Each location
+    keeps its own job so that it can be cancelled and retried with backoff independently.
+    :param static_location_ids: iterable of hex IDs of the static locations to update
+    """
+    for index, static_location_id in enumerate(static_location_ids):
+        _enqueue_network_location_update(
+            static_location_id, delay=STATIC_LOCATION_UPDATE_STAGGER * index
+        )
+
+
 @register_task(
     job_id=CONNECTION_RESET_JOB_ID, priority=Priority.HIGH, status_fn=status_fn
 )
@@ -388,27 +567,39 @@ def reset_connection_states(broadcast_id):
     """
     _refresh_reserved_locations()
 
-    for network_location in NetworkLocation.objects.exclude(
-        broadcast_id=broadcast_id
-    ).filter(connection_status=ConnectionStatus.Okay):
+    using = router.db_for_write(NetworkLocation)
+    lock_rows = connections[using].features.has_select_for_update
+    stale_locations = NetworkLocation.objects.exclude(broadcast_id=broadcast_id)
+    connected_locations = stale_locations.filter(
+        connection_status=ConnectionStatus.Okay
+    )
+    if not lock_rows:
+        # SQLite can't lock rows, and a read would start the transaction with a snapshot
+        # that fails to upgrade to a write if another connection commits meanwhile, so
+        # read before the transaction and make its first statement a write
+        disconnected_locations = list(connected_locations)
+
+    with transaction.atomic(using=using):
+        if lock_rows:
+            # lock the connected locations so a concurrent connection check can't flip
+            # them back to Okay between reading them here and resetting them below
+            disconnected_locations = list(connected_locations.select_for_update())
+        # remove any dynamic locations that don't match the current broadcast
+        DynamicNetworkLocation.objects.exclude(broadcast_id=broadcast_id).delete()
+        # reset the connection status for each
+        stale_locations.update(
+            connection_status=ConnectionStatus.Unknown,
+            connection_faults=0,
+        )
+
+    for network_location in disconnected_locations:
         # cancel pending connect jobs
         job_storage.cancel_if_exists(generate_job_id(TYPE_CONNECT, network_location.id))
         # dispatch disconnect hooks
-        _dispatch_discovery_hooks(network_location, False)
-
-    # remove any dynamic locations that don't match the current broadcast
-    DynamicNetworkLocation.objects.exclude(broadcast_id=broadcast_id).delete()
-    # reset the connection status for each
-    NetworkLocation.objects.exclude(broadcast_id=broadcast_id).update(
-        connection_status=ConnectionStatus.Unknown,
-        connection_faults=0,
-    )
+        _enqueue_discovery_hooks(network_location, False)
 
+    _cancel_orphaned_network_location_updates()
     # enqueue update tasks for all static locations
-    for static_location_id in StaticNetworkLocation.objects.all().values_list(
-        "id", flat=True
-    ):
-        perform_network_location_update.enqueue(
-            job_id=generate_job_id(TYPE_CONNECT, static_location_id),
-            args=(static_location_id,),
-        )
+    _enqueue_static_location_updates(
+        StaticNetworkLocation.objects.all().values_list("id", flat=True)
+    )
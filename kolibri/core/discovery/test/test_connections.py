@@ -2,6 +2,7 @@ import mock
 from django.test import TestCase
 
 from ..models import ConnectionStatus
+from ..models import DynamicNetworkLocation
 from ..models import LocationTypes
 from ..models import NetworkLocation
 from ..utils.network import errors
@@ -17,13 +18,13 @@ class BaseTestCase(TestCase):
     databases = "__all__"
 
     def setUp(self):
-        self.mock_location = mock.MagicMock(
-            spec=NetworkLocation(),
+        # an unsaved location, so saving the connection state doesn't update anything
+        self.mock_location = NetworkLocation(
             id="mock_location_id",
+            base_url="http://mock.qqq",
             instance_id=None,
             connection_status=ConnectionStatus.Unknown,
             connection_faults=0,
-            reserved=False,
         )
 
 
@@ -91,6 +92,39 @@ class CaptureConnectionStateTestCase(BaseTestCase):
         )
         self.assertEqual(self.mock_location.connection_faults, 1)
 
+    def test_saves_only_connection_fields(self):
+        location = DynamicNetworkLocation.objects.create(
+            id="a" * 32,
+            base_url="http://url.qqq",
+            broadcast_id="b" * 32,
+            instance_id="a" * 32,
+        )
+        # the location is rediscovered during a new broadcast while being checked
+        DynamicNetworkLocation.objects.filter(id=location.id).update(
+            broadcast_id="c" * 32
+        )
+        with capture_connection_state(location):
+            raise errors.NetworkLocationConnectionFailure()
+
+        location.refresh_from_db()
+        self.assertEqual(location.connection_status, ConnectionStatus.ConnectionFailure)
+        self.assertEqual(location.connection_faults, 1)
+        self.assertEqual(location.broadcast_id, "c" * 32)
+
+    def test_location_deleted_during_check(self):
+        location = DynamicNetworkLocation.objects.create(
+            id="a" * 32,
+            base_url="http://url.qqq",
+            broadcast_id="b" * 32,
+            instance_id="a" * 32,
+        )
+        with capture_connection_state(location):
+            # the location is removed while its connection is being checked
+            DynamicNetworkLocation.objects.filter(id=location.id).delete()
+
+        self.assertEqual(location.connection_status, ConnectionStatus.Okay)
+        self.assertFalse(NetworkLocation.objects.filter(id=location.id).exists())
+
 
 class UpdateNetworkLocationTestCase(BaseTestCase):
     def setUp(self):
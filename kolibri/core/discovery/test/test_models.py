@@ -1,7 +1,11 @@
+import mock
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 from django.test import TestCase
 
 from ..models import ConnectionStatus
 from ..models import DynamicNetworkLocation
+from ..models import DynamicNetworkLocationManager
 from ..models import LocationTypes
 from ..models import NetworkLocation
 from ..models import StaticNetworkLocation
@@ -35,3 +39,79 @@ class NetworkLocationTestCase(TestCase):
         self.assertFalse(dynamic.reserved)
         reserved = NetworkLocation(location_type=LocationTypes.Reserved)
         self.assertTrue(reserved.reserved)
+
+
+class DynamicNetworkLocationManagerTestCase(TestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.instance_id = "a" * 32
+        self.defaults = dict(
+            base_url="http://url.qqq",
+            broadcast_id="b" * 32,
+            instance_id=self.instance_id,
+            application="kolibri",
+            unsupported_field="ignored",
+        )
+
+    def test_upsert__creates(self):
+        location = DynamicNetworkLocation.objects.upsert(
+            self.defaults, pk=self.instance_id
+        )
+        self.assertEqual(location.id, self.instance_id)
+        self.assertEqual(location.location_type, LocationTypes.Dynamic)
+        self.assertTrue(location.is_local)
+        self.assertTrue(
+            DynamicNetworkLocation.objects.filter(pk=self.instance_id).exists()
+        )
+
+    def test_upsert__updates(self):
+        existing = DynamicNetworkLocation.objects.create(
+            id=self.instance_id,
+            base_url="http://old.qqq",
+            broadcast_id="c" * 32,
+            instance_id=self.instance_id,
+            connection_status=ConnectionStatus.Okay,
+        )
+        location = DynamicNetworkLocation.objects.upsert(
+            self.defaults, pk=self.instance_id
+        )
+        self.assertEqual(location.base_url, "http://url.qqq")
+        self.assertEqual(location.broadcast_id, "b" * 32)
+        self.assertEqual(location.connection_status, ConnectionStatus.Okay)
+        self.assertEqual(location.added, existing.added)
+        self.assertEqual(DynamicNetworkLocation.objects.count(), 1)
+
+    def test_upsert__mismatched_instance_id(self):
+        with self.assertRaises(ValidationError):
+            DynamicNetworkLocation.objects.upsert(self.defaults, pk="d" * 32)
+        self.assertFalse(DynamicNetworkLocation.objects.exists())
+
+    def test_upsert__concurrent_insert(self):
+        update_existing = DynamicNetworkLocationManager._update_existing
+
+        def racing_update_existing(manager, pk, defaults):
+            if not DynamicNetworkLocation.objects.filter(pk=pk).exists():
+                # another discovery of the same instance inserts it after our update missed
+                DynamicNetworkLocation.objects.create(
+                    id=pk, base_url="http://old.qqq", instance_id=pk
+                )
+                return 0
+            return update_existing(manager, pk, defaults)
+
+        with mock.patch.object(
+            DynamicNetworkLocationManager, "_update_existing", racing_update_existing
+        ):
+            location = DynamicNetworkLocation.objects.upsert(
+                self.defaults, pk=self.instance_id
+            )
+        self.assertEqual(location.base_url, "http://url.qqq")
+        self.assertEqual(DynamicNetworkLocation.objects.count(), 1)
+
+    def test_upsert__static_location_conflict(self):
+        StaticNetworkLocation.objects.create(
+            id=self.instance_id, base_url="http://static.qqq"
+        )
+        with self.assertRaises(IntegrityError):
+            DynamicNetworkLocation.objects.upsert(self.defaults, pk=self.instance_id)
+        self.assertFalse(DynamicNetworkLocation.objects.exists())
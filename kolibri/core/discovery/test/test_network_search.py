@@ -85,7 +85,7 @@ class NetworkLocationListenerTestCase(TestCase):
         self.listener.add_instance(self.instance)
         mock_priority_method.assert_called_once_with(self.instance)
         mock_enqueue.assert_called_once_with(
-            job_id="9e89d3ea5256721c9cd631eac36feafe",
+            job_id="fc76cc89ee3718d712e163954b3fe669",
             args=(self.broadcast.id, self.instance.to_dict()),
             priority=mock_priority_method(),
         )
@@ -96,7 +96,7 @@ class NetworkLocationListenerTestCase(TestCase):
         self.listener.update_instance(self.instance)
         mock_priority_method.assert_called_once_with(self.instance)
         mock_enqueue.assert_called_once_with(
-            job_id="9e89d3ea5256721c9cd631eac36feafe",
+            job_id="fc76cc89ee3718d712e163954b3fe669",
             args=(self.broadcast.id, self.instance.to_dict()),
             priority=mock_priority_method(),
         )
@@ -105,6 +105,6 @@ class NetworkLocationListenerTestCase(TestCase):
     def test_remove_instance(self, mock_enqueue):
         self.listener.remove_instance(self.instance)
         mock_enqueue.assert_called_once_with(
-            job_id="c5e88d1cb4a342ad3d23081022248fbc",
+            job_id="4a3af4605896b31375550f39ff1b4f76",
             args=(self.broadcast.id, self.instance.to_dict()),
         )
@@ -1,30 +1,54 @@
 import datetime
 import functools
+import os
+import shutil
+import tempfile
 import uuid
 
 import mock
+from django.db import connections
+from django.db import router
 from django.test import TestCase
+from django.test import TransactionTestCase
 
+from ..hooks import NetworkLocationDiscoveryHook
 from ..models import ConnectionStatus
 from ..models import DynamicNetworkLocation
 from ..models import LocationTypes
 from ..models import NetworkLocation
 from ..models import StaticNetworkLocation
 from ..tasks import _dispatch_discovery_hooks
+from ..tasks import _enqueue_discovery_hooks
+from ..tasks import _enqueue_network_location_update
 from ..tasks import _enqueue_network_location_update_with_backoff
 from ..tasks import _update_connection_status
 from ..tasks import add_dynamic_network_location
 from ..tasks import CONNECTION_FAULT_LIMIT
+from ..tasks import DISCOVERY_HOOKS_RETRY_DELAY
 from ..tasks import dispatch_broadcast_hooks
+from ..tasks import dispatch_discovery_hooks
+from ..tasks import enqueue_deferred_discovery_hooks
 from ..tasks import generate_job_id
 from ..tasks import hydrate_instance
+from ..tasks import MAX_BACKOFF_MINUTES
 from ..tasks import perform_network_location_update
 from ..tasks import remove_dynamic_network_location
 from ..tasks import reset_connection_states
+from ..tasks import STATIC_LOCATION_UPDATE_STAGGER
+from ..tasks import TYPE_CONNECT
+from ..tasks import TYPE_DEFERRED_HOOKS
+from ..tasks import TYPE_HOOKS
 from ..utils.network.broadcast import KolibriInstance
 from .helpers import info as mock_device_info
+from kolibri.core.sqlite.pragmas import START_PRAGMAS
+from kolibri.core.tasks.exceptions import JobNotFound
+from kolibri.core.tasks.exceptions import JobRunning
 from kolibri.core.tasks.job import Priority
+from kolibri.core.tasks.job import State
+from kolibri.core.tasks.main import job_storage
 from kolibri.core.tasks.registry import RegisteredTask
+from kolibri.utils.time_utils import local_now
+from kolibri.utils.time_utils import naive_utc_datetime
 
 MOCK_INTERFACE_IP = "111.222.111.222"
 MOCK_PORT = 555
@@ -119,44 +143,55 @@ class AddDynamicNetworkLocationTestCase(TestCase):
         )
         self.task = unwrap(unwrap(add_dynamic_network_location))
 
-    @mock.patch("kolibri.core.discovery.tasks.perform_network_location_update.enqueue")
+    @mock.patch(
+        "kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in"
+    )
     @mock.patch("kolibri.core.discovery.tasks._store_dynamic_instance")
     def test_could_not_add(self, mock_store, mock_enqueue_update):
         mock_store.return_value = None
         self.task(self.broadcast_id, self.instance)
         mock_enqueue_update.assert_not_called()
-        self.assertEqual(6, mock_store.call_count)
+        mock_store.assert_called_once_with(self.broadcast_id, self.instance)
 
     @mock.patch("kolibri.core.discovery.tasks.get_device_setting", return_value=True)
-    @mock.patch("kolibri.core.discovery.tasks.perform_network_location_update.enqueue")
+    @mock.patch(
+        "kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in"
+    )
     def test_added__not_soud(self, mock_enqueue_update, mock_get_device_setting):
         mock_get_device_setting.return_value = False
         self.task(self.broadcast_id, self.instance)
         mock_enqueue_update.assert_called_once_with(
-            job_id="88452dfa2ec2726589d4c63732cc51e4",
+            datetime.timedelta(0),
+            job_id="53ac7f22de329604ca49aa0fd5c83f86",
             args=(self.instance.id,),
             priority=Priority.REGULAR,
         )
 
     @mock.patch("kolibri.core.discovery.tasks.get_device_setting", return_value=True)
-    @mock.patch("kolibri.core.discovery.tasks.perform_network_location_update.enqueue")
+    @mock.patch(
+        "kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in"
+    )
     def test_added__soud(self, mock_enqueue_update, mock_get_device_setting):
         mock_get_device_setting.return_value = True
         self.task(self.broadcast_id, self.instance)
         mock_enqueue_update.assert_called_once_with(
-            job_id="88452dfa2ec2726589d4c63732cc51e4",
+            datetime.timedelta(0),
+            job_id="53ac7f22de329604ca49aa0fd5c83f86",
             args=(self.instance.id,),
             priority=Priority.HIGH,
         )
 
     @mock.patch("kolibri.core.discovery.tasks.get_device_setting", return_value=True)
-    @mock.patch("kolibri.core.discovery.tasks.perform_network_location_update.enqueue")
+    @mock.patch(
+        "kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in"
+    )
     def test_added__both_souds(self, mock_enqueue_update, mock_get_device_setting):
         self.instance.device_info.update(subset_of_users_device=True)
         mock_get_device_setting.return_value = True
         self.task(self.broadcast_id, self.instance)
         mock_enqueue_update.assert_called_once_with(
-            job_id="88452dfa2ec2726589d4c63732cc51e4",
+            datetime.timedelta(0),
+            job_id="53ac7f22de329604ca49aa0fd5c83f86",
             args=(self.instance.id,),
             priority=Priority.LOW,
         )
@@ -188,19 +223,19 @@ class RemoveDynamicNetworkLocationTestCase(TestCase):
         )
         self.task = unwrap(unwrap(remove_dynamic_network_location))
 
-    @mock.patch("kolibri.core.discovery.tasks._dispatch_discovery_hooks")
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
     def test_not_found(self, mock_dispatch):
         self.task("b" * 32, self.instance)
         mock_dispatch.assert_not_called()
 
-    @mock.patch("kolibri.core.discovery.tasks._dispatch_discovery_hooks")
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
     def test_static_location(self, mock_dispatch):
         self.network_location.location_type = LocationTypes.Static
         self.network_location.save()
         self.task(self.broadcast_id, self.instance)
         mock_dispatch.assert_not_called()
 
-    @mock.patch("kolibri.core.discovery.tasks._dispatch_discovery_hooks")
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
     def test_dispatch(self, mock_dispatch):
         self.task(self.broadcast_id, self.instance)
         mock_dispatch.assert_called_once()
@@ -305,8 +340,10 @@ class ResetConnectionStatesTestCase(TestCase):
         )
         self.task = unwrap(reset_connection_states)
 
-    @mock.patch("kolibri.core.discovery.tasks.perform_network_location_update.enqueue")
-    @mock.patch("kolibri.core.discovery.tasks._dispatch_discovery_hooks")
+    @mock.patch(
+        "kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in"
+    )
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
     def test_new_broadcast(self, mock_dispatch, mock_enqueue_update):
         self.task(self.new_broadcast_id)
         self.assertEqual(2, mock_dispatch.call_count)
@@ -322,12 +359,16 @@ class ResetConnectionStatesTestCase(TestCase):
         self.assertEqual(DynamicNetworkLocation.objects.count(), 0)
 
         mock_enqueue_update.assert_called_once_with(
-            job_id="4a5f6088c8c0e5e22fde5945a7f91789",
+            datetime.timedelta(0),
+            job_id="9359172ceef8bfe0669747116efd1331",
             args=(self.static_network_location.id,),
+            priority=None,
         )
 
-    @mock.patch("kolibri.core.discovery.tasks.perform_network_location_update.enqueue")
-    @mock.patch("kolibri.core.discovery.tasks._dispatch_discovery_hooks")
+    @mock.patch(
+        "kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in"
+    )
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
     def test_dynamic_already_added_for_new_broadcast(
         self, mock_dispatch, mock_enqueue_update
     ):
@@ -351,9 +392,237 @@ class ResetConnectionStatesTestCase(TestCase):
         )
 
         mock_enqueue_update.assert_called_once_with(
-            job_id="4a5f6088c8c0e5e22fde5945a7f91789",
+            datetime.timedelta(0),
+            job_id="9359172ceef8bfe0669747116efd1331",
             args=(self.static_network_location.id,),
+            priority=None,
+        )
+
+    @mock.patch(
+        "kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in"
+    )
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
+    def test_static_updates_staggered(self, mock_dispatch, mock_enqueue_update):
+        other_static_network_location = StaticNetworkLocation.objects.create(
+            id="x" * 32,
+            base_url="http://url4.qqq",
+            connection_status=ConnectionStatus.Unknown,
+            connection_faults=0,
+            instance_id="x" * 32,
+            subset_of_users_device=False,
+        )
+        self.task(self.new_broadcast_id)
+        self.assertEqual(2, mock_enqueue_update.call_count)
+        delays = sorted(
+            call_args[0] for call_args, _ in mock_enqueue_update.call_args_list
+        )
+        self.assertEqual(
+            delays, [datetime.timedelta(0), STATIC_LOCATION_UPDATE_STAGGER]
+        )
+        self.assertEqual(
+            {
+                call_kwargs["args"][0]
+                for _, call_kwargs in mock_enqueue_update.call_args_list
+            },
+            {self.static_network_location.id, other_static_network_location.id},
+        )
+
+    @mock.patch(
+        "kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in"
+    )
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
+    def test_static_update_already_running(self, mock_dispatch, mock_enqueue_update):
+        other_static_network_location = StaticNetworkLocation.objects.create(
+            id="x" * 32,
+            base_url="http://url4.qqq",
+            connection_status=ConnectionStatus.Unknown,
+            connection_faults=0,
+            instance_id="x" * 32,
+            subset_of_users_device=False,
+        )
+        # the first location's connection check starts running before it can be re-enqueued
+        mock_enqueue_update.side_effect = [JobRunning(), None]
+        self.task(self.new_broadcast_id)
+        self.assertEqual(2, mock_enqueue_update.call_count)
+        self.assertEqual(
+            {
+                call_kwargs["args"][0]
+                for _, call_kwargs in mock_enqueue_update.call_args_list
+            },
+            {self.static_network_location.id, other_static_network_location.id},
+        )
+
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
+    def test_cancels_orphaned_updates(self, mock_dispatch):
+        self.addCleanup(job_storage.clear, force=True)
+        # a connection check enqueued under an MD5 job ID, and one under the current ID
+        orphaned_job_id = "a" * 32
+        perform_network_location_update.enqueue_in(
+            datetime.timedelta(minutes=30),
+            job_id=orphaned_job_id,
+            args=(self.static_network_location.id,),
+        )
+        current_job_id = generate_job_id(TYPE_CONNECT, "x" * 32)
+        perform_network_location_update.enqueue_in(
+            datetime.timedelta(minutes=30),
+            job_id=current_job_id,
+            args=("x" * 32,),
+        )
+
+        with mock.patch(
+            "kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in"
+        ):
+            self.task(self.new_broadcast_id)
+
+        with self.assertRaises(JobNotFound):
+            job_storage.get_orm_job(orphaned_job_id)
+        self.assertEqual(job_storage.get_orm_job(current_job_id).state, State.QUEUED)
+
+
+class ResetConnectionStatesConcurrencyTestCase(TransactionTestCase):
+    """
+    Runs against a file backed database in WAL mode, as the in-memory test database
+    doesn't lock the way a deployed SQLite database does
+    """
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.alias = router.db_for_write(NetworkLocation)
+        if connections[self.alias].vendor != "sqlite":
+            self.skipTest("Only SQLite locks the whole database for writes")
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        database_path = os.path.join(temp_dir, "networklocation.sqlite3")
+
+        connection = self._create_connection(database_path)
+        with connection.cursor() as cursor:
+            cursor.execute(START_PRAGMAS)
+        with connection.schema_editor() as editor:
+            editor.create_model(NetworkLocation)
+        self.addCleanup(connections.__setitem__, self.alias, connections[self.alias])
+        connections[self.alias] = connection
+        self.other_connection = self._create_connection(database_path)
+
+        self.network_location = StaticNetworkLocation.objects.create(
+            id="z" * 32,
+            base_url="http://url2.qqq",
+            connection_status=ConnectionStatus.Okay,
+            connection_faults=0,
+            instance_id="z" * 32,
+            subset_of_users_device=False,
+        )
+
+    def _create_connection(self, database_path):
+        connection = connections.create_connection(self.alias)
+        connection.settings_dict = dict(connection.settings_dict, NAME=database_path)
+        self.addCleanup(connection.close)
+        return connection
+
+    @mock.patch(
+        "kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in"
+    )
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
+    def test_write_committed_after_reading_connected_locations(
+        self, mock_dispatch, mock_enqueue_update
+    ):
+        written = []
+
+        def write_after_read(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if not written and ConnectionStatus.Okay in (params or ()):
+                # another connection commits a write before the reset gets to write
+                with self.other_connection.cursor() as cursor:
+                    cursor.execute(
+                        "UPDATE {} SET nickname = %s WHERE id = %s".format(
+                            NetworkLocation._meta.db_table
+                        ),
+                        ["concurrent", self.network_location.id],
+                    )
+                written.append(sql)
+            return result
+
+        with connections[self.alias].execute_wrapper(write_after_read):
+            unwrap(reset_connection_states)(uuid.uuid4().hex)
+
+        self.assertTrue(written)
+        mock_dispatch.assert_called_once()
+        self.network_location.refresh_from_db()
+        self.assertEqual(self.network_location.nickname, "concurrent")
+        self.assertEqual(
+            self.network_location.connection_status, ConnectionStatus.Unknown
+        )
+
+
+@mock.patch("kolibri.core.discovery.tasks.perform_network_location_update.enqueue_in")
+@mock.patch("kolibri.core.discovery.tasks.job_storage")
+class EnqueueNetworkLocationUpdateTestCase(TestCase):
+    def setUp(self):
+        self.network_location_id = "a" * 32
+        self.job_id = generate_job_id(TYPE_CONNECT, self.network_location_id)
+        self.delay = datetime.timedelta(minutes=5)
+
+    def _existing_job(self, state, delay):
+        return mock.Mock(
+            state=state, scheduled_time=naive_utc_datetime(local_now() + delay)
+        )
+
+    def test_no_existing_job(self, mock_job_storage, mock_enqueue_in):
+        mock_job_storage.get_orm_job.side_effect = JobNotFound()
+        _enqueue_network_location_update(
+            self.network_location_id, delay=self.delay, priority=Priority.HIGH
+        )
+        mock_job_storage.get_orm_job.assert_called_once_with(self.job_id)
+        mock_enqueue_in.assert_called_once_with(
+            self.delay,
+            job_id=self.job_id,
+            args=(self.network_location_id,),
+            priority=Priority.HIGH,
+        )
+
+    def test_existing_job_running(self, mock_job_storage, mock_enqueue_in):
+        mock_job_storage.get_orm_job.return_value = self._existing_job(
+            State.RUNNING, -self.delay
+        )
+        _enqueue_network_location_update(self.network_location_id)
+        mock_job_storage.get_orm_job.assert_called_once_with(self.job_id)
+        mock_enqueue_in.assert_not_called()
+
+    def test_existing_job_selected(self, mock_job_storage, mock_enqueue_in):
+        mock_job_storage.get_orm_job.return_value = self._existing_job(
+            State.SELECTED, -self.delay
+        )
+        _enqueue_network_location_update(self.network_location_id)
+        mock_job_storage.get_orm_job.assert_called_once_with(self.job_id)
+        mock_enqueue_in.assert_not_called()
+
+    def test_existing_job_queued_sooner(self, mock_job_storage, mock_enqueue_in):
+        mock_job_storage.get_orm_job.return_value = self._existing_job(
+            State.QUEUED, datetime.timedelta(0)
+        )
+        _enqueue_network_location_update(self.network_location_id, delay=self.delay)
+        mock_job_storage.get_orm_job.assert_called_once_with(self.job_id)
+        mock_enqueue_in.assert_not_called()
+
+    def test_existing_job_queued_later(self, mock_job_storage, mock_enqueue_in):
+        mock_job_storage.get_orm_job.return_value = self._existing_job(
+            State.QUEUED, self.delay * 2
+        )
+        _enqueue_network_location_update(self.network_location_id, delay=self.delay)
+        mock_enqueue_in.assert_called_once()
+
+    def test_existing_job_completed(self, mock_job_storage, mock_enqueue_in):
+        mock_job_storage.get_orm_job.return_value = self._existing_job(
+            State.COMPLETED, -self.delay
         )
+        _enqueue_network_location_update(self.network_location_id)
+        mock_enqueue_in.assert_called_once()
+
+    def test_started_running_meanwhile(self, mock_job_storage, mock_enqueue_in):
+        mock_job_storage.get_orm_job.side_effect = JobNotFound()
+        mock_enqueue_in.side_effect = JobRunning()
+        _enqueue_network_location_update(self.network_location_id)
+        mock_enqueue_in.assert_called_once()
 
 
 class TaskUtilitiesTestCase(TestCase):
@@ -409,7 +678,145 @@ class TaskUtilitiesTestCase(TestCase):
         hook1.on_connect.assert_called_once_with(self.network_location)
         hook2.on_connect.assert_called_once_with(self.network_location)
 
-    @mock.patch("kolibri.core.discovery.tasks._dispatch_discovery_hooks")
+    @mock.patch("kolibri.core.discovery.tasks.logger")
+    @mock.patch("kolibri.core.discovery.tasks.NetworkLocationDiscoveryHook")
+    def test_dispatch_hooks__no_hooks(self, mock_hooks, mock_logger):
+        mock_hooks.registered_hooks = []
+        _dispatch_discovery_hooks(self.network_location, True)
+        mock_logger.debug.assert_not_called()
+
+    @mock.patch("kolibri.core.discovery.tasks.dispatch_discovery_hooks.enqueue_in")
+    @mock.patch("kolibri.core.discovery.tasks.NetworkLocationDiscoveryHook")
+    def test_enqueue_hooks(self, mock_hooks, mock_enqueue):
+        mock_hooks.registered_hooks = [mock.Mock()]
+        _enqueue_discovery_hooks(self.network_location, True)
+        mock_enqueue.assert_called_once()
+        self.assertEqual(mock_enqueue.call_args[0][0], datetime.timedelta(0))
+        self.assertEqual(
+            mock_enqueue.call_args[1]["job_id"],
+            generate_job_id(TYPE_HOOKS, self.network_location.id),
+        )
+        serialized, is_connected = mock_enqueue.call_args[1]["args"]
+        self.assertTrue(is_connected)
+        self.assertIn(self.network_location.id, serialized)
+
+    @mock.patch("kolibri.core.discovery.tasks.dispatch_discovery_hooks.enqueue_in")
+    @mock.patch("kolibri.core.discovery.tasks.NetworkLocationDiscoveryHook")
+    def test_enqueue_hooks__same_job_for_transitions(self, mock_hooks, mock_enqueue):
+        mock_hooks.registered_hooks = [mock.Mock()]
+        _enqueue_discovery_hooks(self.network_location, True)
+        _enqueue_discovery_hooks(self.network_location, False)
+        self.assertEqual(2, mock_enqueue.call_count)
+        self.assertEqual(
+            {call_kwargs["job_id"] for _, call_kwargs in mock_enqueue.call_args_list},
+            {generate_job_id(TYPE_HOOKS, self.network_location.id)},
+        )
+
+    @mock.patch(
+        "kolibri.core.discovery.tasks.enqueue_deferred_discovery_hooks.enqueue_in"
+    )
+    @mock.patch("kolibri.core.discovery.tasks.dispatch_discovery_hooks.enqueue_in")
+    @mock.patch("kolibri.core.discovery.tasks.NetworkLocationDiscoveryHook")
+    def test_enqueue_hooks__running(self, mock_hooks, mock_enqueue, mock_defer):
+        mock_hooks.registered_hooks = [mock.Mock()]
+        # the hooks for an earlier transition are being dispatched
+        mock_enqueue.side_effect = JobRunning()
+        _enqueue_discovery_hooks(self.network_location, False)
+        mock_defer.assert_called_once()
+        self.assertEqual(mock_defer.call_args[0][0], DISCOVERY_HOOKS_RETRY_DELAY)
+        self.assertEqual(
+            mock_defer.call_args[1]["job_id"],
+            generate_job_id(TYPE_DEFERRED_HOOKS, self.network_location.id),
+        )
+        network_location_id, serialized, is_connected = mock_defer.call_args[1]["args"]
+        self.assertEqual(network_location_id, self.network_location.id)
+        self.assertIn(self.network_location.id, serialized)
+        self.assertFalse(is_connected)
+
+    @mock.patch("kolibri.core.discovery.tasks.job_storage")
+    @mock.patch("kolibri.core.discovery.tasks.dispatch_discovery_hooks.enqueue_in")
+    @mock.patch("kolibri.core.discovery.tasks.NetworkLocationDiscoveryHook")
+    def test_enqueue_hooks__cancels_deferred(
+        self, mock_hooks, mock_enqueue, mock_job_storage
+    ):
+        mock_hooks.registered_hooks = [mock.Mock()]
+        mock_job_storage.get_orm_job.return_value.state = State.QUEUED
+        _enqueue_discovery_hooks(self.network_location, True)
+        mock_enqueue.assert_called_once()
+        mock_job_storage.cancel.assert_called_once_with(
+            generate_job_id(TYPE_DEFERRED_HOOKS, self.network_location.id)
+        )
+
+    @mock.patch("kolibri.core.discovery.tasks.get_current_job")
+    @mock.patch("kolibri.core.discovery.tasks.dispatch_discovery_hooks.enqueue_in")
+    def test_deferred_hooks_task(self, mock_enqueue, mock_get_current_job):
+        unwrap(enqueue_deferred_discovery_hooks)(
+            self.network_location.id, "serialized", True
+        )
+        mock_enqueue.assert_called_once_with(
+            datetime.timedelta(0),
+            job_id=generate_job_id(TYPE_HOOKS, self.network_location.id),
+            args=("serialized", True),
+        )
+        mock_get_current_job.return_value.retry_in.assert_not_called()
+
+    @mock.patch("kolibri.core.discovery.tasks.get_current_job")
+    @mock.patch("kolibri.core.discovery.tasks.dispatch_discovery_hooks.enqueue_in")
+    def test_deferred_hooks_task__still_running(
+        self, mock_enqueue, mock_get_current_job
+    ):
+        mock_enqueue.side_effect = JobRunning()
+        unwrap(enqueue_deferred_discovery_hooks)(
+            self.network_location.id, "serialized", True
+        )
+        mock_get_current_job.return_value.retry_in.assert_called_once_with(
+            DISCOVERY_HOOKS_RETRY_DELAY
+        )
+
+    @mock.patch("kolibri.core.discovery.tasks.dispatch_discovery_hooks.enqueue_in")
+    def test_enqueue_hooks__only_overridden_methods(self, mock_enqueue):
+        class ConnectOnlyHook(NetworkLocationDiscoveryHook):
+            _not_abstract = True
+
+            def on_connect(self, network_location):
+                pass
+
+        with mock.patch.object(
+            NetworkLocationDiscoveryHook,
+            "_registered_hooks",
+            {"connect_only": ConnectOnlyHook()},
+        ):
+            _enqueue_discovery_hooks(self.network_location, False)
+            mock_enqueue.assert_not_called()
+            _enqueue_discovery_hooks(self.network_location, True)
+            mock_enqueue.assert_called_once()
+
+    @mock.patch("kolibri.core.discovery.tasks.dispatch_discovery_hooks.enqueue_in")
+    @mock.patch("kolibri.core.discovery.tasks.NetworkLocationDiscoveryHook")
+    def test_enqueue_hooks__no_hooks(self, mock_hooks, mock_enqueue):
+        mock_hooks.registered_hooks = []
+        _enqueue_discovery_hooks(self.network_location, True)
+        mock_enqueue.assert_not_called()
+
+    @mock.patch("kolibri.core.discovery.tasks.NetworkLocationDiscoveryHook")
+    def test_dispatch_hooks_task__deleted_location(self, mock_hooks):
+        hook = mock.Mock()
+        mock_hooks.registered_hooks = [hook]
+        with mock.patch(
+            "kolibri.core.discovery.tasks.dispatch_discovery_hooks.enqueue_in"
+        ) as mock_enqueue:
+            _enqueue_discovery_hooks(self.network_location, False)
+        network_location_id = self.network_location.id
+        self.network_location.delete()
+
+        dispatch_discovery_hooks(*mock_enqueue.call_args[1]["args"])
+        hook.on_disconnect.assert_called_once()
+        network_location = hook.on_disconnect.call_args[0][0]
+        self.assertIsInstance(network_location, DynamicNetworkLocation)
+        self.assertEqual(network_location.id, network_location_id)
+        self.assertEqual(network_location.broadcast_id, self.broadcast_id)
+
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
     @mock.patch("kolibri.core.discovery.tasks.update_network_location")
     def test_update_connection_status__connected(self, mock_update, mock_dispatch):
         mock_update.side_effect = functools.partial(
@@ -418,7 +825,7 @@ class TaskUtilitiesTestCase(TestCase):
         _update_connection_status(self.network_location)
         mock_dispatch.assert_called_once_with(self.network_location, True)
 
-    @mock.patch("kolibri.core.discovery.tasks._dispatch_discovery_hooks")
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
     @mock.patch("kolibri.core.discovery.tasks.update_network_location")
     def test_update_connection_status__disconnected(self, mock_update, mock_dispatch):
         self.network_location.connection_status = ConnectionStatus.Okay
@@ -428,7 +835,7 @@ class TaskUtilitiesTestCase(TestCase):
         _update_connection_status(self.network_location)
         mock_dispatch.assert_called_once_with(self.network_location, False)
 
-    @mock.patch("kolibri.core.discovery.tasks._dispatch_discovery_hooks")
+    @mock.patch("kolibri.core.discovery.tasks._enqueue_discovery_hooks")
     @mock.patch("kolibri.core.discovery.tasks.update_network_location")
     def test_update_connection_status__no_dispatch(self, mock_update, mock_dispatch):
         self.network_location.connection_status = ConnectionStatus.ConnectionFailure
@@ -451,36 +858,57 @@ class TaskUtilitiesTestCase(TestCase):
 
     def test_generate_job_id(self):
         self.assertEqual(
-            generate_job_id("test", "a" * 32), "42440939765e6e06237a90ec42c80b4b"
+            generate_job_id("test", "a" * 32), "5a746430651892bea52989773aa83ed8"
         )
 
+    @mock.patch("kolibri.core.discovery.tasks.random.uniform", side_effect=max)
     @mock.patch("kolibri.core.discovery.tasks.get_current_job")
     def test_enqueue_network_location_update_with_backoff__zero_faults(
-        self, mock_get_current_job
+        self, mock_get_current_job, mock_uniform
     ):
         current_job_mock = mock.MagicMock()
         mock_get_current_job.return_value = current_job_mock
         next_attempt = datetime.timedelta(minutes=1)
         _enqueue_network_location_update_with_backoff(self.network_location)
+        mock_uniform.assert_called_once_with(0.5, 1)
         current_job_mock.retry_in.assert_called_once_with(
             next_attempt,
             priority=Priority.LOW,
         )
 
+    @mock.patch("kolibri.core.discovery.tasks.random.uniform", side_effect=max)
     @mock.patch("kolibri.core.discovery.tasks.get_current_job")
     def test_enqueue_network_location_update_with_backoff__non_zero_faults(
-        self, mock_get_current_job
+        self, mock_get_current_job, mock_uniform
     ):
         current_job_mock = mock.MagicMock()
         mock_get_current_job.return_value = current_job_mock
         self.network_location.connection_faults = 3
         next_attempt = datetime.timedelta(minutes=8)
         _enqueue_network_location_update_with_backoff(self.network_location)
+        mock_uniform.assert_called_once_with(4, 8)
         current_job_mock.retry_in.assert_called_once_with(
             next_attempt,
             priority=Priority.LOW,
         )
 
+    @mock.patch("kolibri.core.discovery.tasks.get_current_job")
+    def test_enqueue_network_location_update_with_backoff__max_faults(
+        self, mock_get_current_job
+    ):
+        current_job_mock = mock.MagicMock()
+        mock_get_current_job.return_value = current_job_mock
+        self.network_location.connection_faults = CONNECTION_FAULT_LIMIT
+        _enqueue_network_location_update_with_backoff(self.network_location)
+        current_job_mock.retry_in.assert_called_once()
+        next_attempt = current_job_mock.retry_in.call_args[0][0]
+        self.assertGreaterEqual(
+            next_attempt, datetime.timedelta(minutes=MAX_BACKOFF_MINUTES / 2.0)
+        )
+        self.assertLessEqual(
+            next_attempt, datetime.timedelta(minutes=MAX_BACKOFF_MINUTES)
+        )
+
     @mock.patch("kolibri.core.discovery.tasks.get_current_job")
     def test_enqueue_network_location_update_with_backoff__not_local(
         self, mock_get_current_job
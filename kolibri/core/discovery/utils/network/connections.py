@@ -3,6 +3,8 @@ from contextlib import closing
 from contextlib import contextmanager
 from ipaddress import ip_address
 
+from django.utils import timezone
+
 from . import errors
 from .client import NetworkClient
 from .urls import parse_address_into_components
@@ -27,6 +29,24 @@ def check_if_port_open(base_url, timeout=1):
         return False
 
 
+# the fields `capture_connection_state` and `capture_network_state` may change, so that saving a
+# location after a connection check doesn't overwrite fields that were updated concurrently, like
+# `broadcast_id` when the location is rediscovered
+CONNECTION_STATE_FIELDS = ("connection_status", "connection_faults", "last_accessed")
+NETWORK_STATE_FIELDS = ("base_url", "last_known_ip", "is_local")
+
+
+def _get_connection_update_fields():
+    from kolibri.core.device.utils import DEVICE_INFO_VERSION
+    from kolibri.core.device.utils import device_info_keys
+
+    return (
+        CONNECTION_STATE_FIELDS
+        + NETWORK_STATE_FIELDS
+        + tuple(device_info_keys.get(DEVICE_INFO_VERSION, []))
+    )
+
+
 DEVICE_INFO_EXPIRY = 3
 DEVICE_PORT_EXPIRY = 60
 DEVICE_INFO_CACHE_KEY = "device_info_cache_{url}"
@@ -96,9 +116,15 @@ def capture_connection_state(network_location):
         # increment the number of faulty connection attempts
         network_location.connection_faults += 1
 
-    # it's possible the network location was deleted while making requests during the context
-    if NetworkLocation.objects.filter(id=network_location.id).exists():
-        network_location.save()
+    # it's possible the network location was deleted while making requests during the context, so
+    # update rather than save, which would fail when there's no longer a row to update
+    network_location.last_accessed = timezone.now()
+    NetworkLocation.objects.filter(id=network_location.id).update(
+        **{
+            field: getattr(network_location, field)
+            for field in _get_connection_update_fields()
+        }
+    )
 
 
 def update_network_location(network_location):